@@ -1,48 +1,221 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from PIL import Image
 import qrcode
+import atexit
+import functools
+import io
+import logging
+import logging.handlers
 import os
+import queue
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _env_flag(name):
+    """True only for an explicit "1"/"true" so values like "0" leave a feature off."""
+    return os.environ.get(name, "").strip().lower() in ("1", "true")
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Routes jsonify and request JSON parsing through orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 CORS(app) # Allows the syncloudconnect.com dashboard to call this engine
+# Behind a proxy that honours X-Sendfile, serve_qr hands file bodies to the proxy
+app.config["USE_X_SENDFILE"] = _env_flag("OMEGA_X_SENDFILE")
 
 # OMEGA UI DESIGN TOKENS
 BASE_DOMAIN = "http://localhost:8888"
 ACCENT_MAGENTA = "\033[95m" # ANSI Magenta for console accents
 RESET = "\033[0m"
 
-def generate_qr_bw(slug, target_url):
-    """Generates simple high-contrast Black & White QR for functionality."""
-    redirect_url = f"{BASE_DOMAIN}/q/{slug}"
-    
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records unformatted so %-formatting also runs on the listener thread."""
+
+    def prepare(self, record):
+        # The queue is in-process, so the record needs no pickling-safe flattening
+        return record
+
+# Request threads only enqueue log records; a background listener formats and writes them
+_log_queue = queue.SimpleQueue()
+_log_console = logging.StreamHandler(sys.stdout)
+_log_console.setFormatter(logging.Formatter(f"{ACCENT_MAGENTA}[Omega UI]{RESET} %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_console)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger("omega")
+logger.setLevel(logging.INFO)
+logger.addHandler(_DeferredQueueHandler(_log_queue))
+logger.propagate = False
+
+QR_BOX_SIZE = 10 # Pixels per QR module
+
+# zlib level 1: two-tone QR output compresses nearly as well at a fraction of the CPU
+PNG_COMPRESS_LEVEL = 1
+
+# Worker threads for the waitress server; all share the in-process render caches
+DEFAULT_WSGI_THREADS = 8
+
+_GENERATE_DEFAULTS = {
+    "slug": "iot-dev",
+    "target": "https://syncloudconnect.com",
+    "format": "json",
+}
+
+# Caps the renders and disk writes a single /generate/batch call can trigger
+MAX_BATCH_ITEMS = 50
+
+_BATCH_ITEM_DEFAULTS = {
+    "type": "bw",
+    "slug": _GENERATE_DEFAULTS["slug"],
+    "target": _GENERATE_DEFAULTS["target"],
+}
+
+# Files written by this process; lets repeat requests skip the PNG write
+_written_files = set()
+
+@functools.lru_cache(maxsize=1024)
+def _encode_qr(redirect_url):
+    """Runs the Reed-Solomon encode + mask selection once per URL.
+
+    Returns the module matrix with the quiet-zone border included. Treat it as read-only.
+    """
+    qr = qrcode.QRCode(version=1, border=4)
     qr.add_data(redirect_url)
     qr.make(fit=True)
+    return qr.get_matrix()
+
+def _matrix_to_pil_1(matrix, box_size):
+    """Rasterizes a module matrix as a 1-bit image at one pixel per module, then upsamples with a single NEAREST resize."""
+    n = len(matrix)
+    # "1;8" unpacks one byte per pixel, so the bitmap never needs to be bit-packed in Python
+    img = Image.frombytes("1", (n, n), bytes(0 if dark else 255 for row in matrix for dark in row), "raw", "1;8")
+    return img.resize((n * box_size, n * box_size), Image.Resampling.NEAREST)
+
+@functools.lru_cache(maxsize=1024)
+def _render_qr_bw(slug):
+    """Encodes the B&W QR straight to PNG bytes. Output is deterministic, so it is cached."""
+    # The payload is the redirect URL only, so the target never changes the image
+    matrix = _encode_qr(f"{BASE_DOMAIN}/q/{slug}")
+
+    # Force standard Black & White for high-reliability IoT scanning. Saving as
+    # 1-bit gives zlib an 8x smaller stream than "L"
+    img = _matrix_to_pil_1(matrix, QR_BOX_SIZE)
 
-    # Force standard Black & White for high-reliability IoT scanning
-    img = qr.make_image(fill_color="black", back_color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
+    return buf.getvalue()
+
+def generate_qr_bw(slug, target_url, persist=True):
+    """Generates simple high-contrast Black & White QR for functionality.
+
+    Returns (filename, png_bytes); the file is only written to disk when persist is set.
+    target_url is where the redirect resolves, so it does not affect the image.
+    """
+    png = _render_qr_bw(slug)
     
     filename = f"qr_{slug}.png"
-    img.save(filename)
-    return filename
+    if persist and (filename not in _written_files or not os.path.exists(filename)):
+        with open(filename, "wb") as f:
+            f.write(png)
+        _written_files.add(filename)
+    return filename, png
 
 @app.route('/generate', methods=['POST'])
 def api_generate():
-    data = request.json
-    slug = data.get("slug", "iot-dev")
-    target = data.get("target", "https://syncloudconnect.com")
+    body = request.get_json(silent=True)
+    data = {**_GENERATE_DEFAULTS, **body} if isinstance(body, dict) else _GENERATE_DEFAULTS
+    slug = str(data["slug"])
+    target = str(data["target"])
     
-    file = generate_qr_bw(slug, target)
-    print(f"{ACCENT_MAGENTA}[Omega UI]{RESET} QR Generated: {file}")
+    # "format": "png" returns the image in the response body and skips the disk write
+    inline = data["format"] == "png"
+    
+    file, png = generate_qr_bw(slug, target, persist=not inline)
+    logger.info("QR Generated: %s", file)
+    if inline:
+        return send_file(io.BytesIO(png), mimetype="image/png", download_name=file)
     return jsonify({"status": "success", "file": file})
 
+# Generators reachable from /generate/batch, keyed by each item's "type"
+_GENERATORS = {
+    "bw": generate_qr_bw,
+}
+
+@app.route('/generate/batch', methods=['POST'])
+def api_generate_batch():
+    """Generates several QRs in one round trip from a JSON list of /generate-style items."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, list):
+        return jsonify({"status": "error", "message": "Expected a JSON list of QR requests"}), 400
+    
+    if len(body) > MAX_BATCH_ITEMS:
+        return jsonify({"status": "error", "message": f"Batch exceeds {MAX_BATCH_ITEMS} items"}), 400
+    
+    # Resolve every item before generating so a bad entry rejects the whole batch
+    jobs = []
+    for item in body:
+        if not isinstance(item, dict):
+            return jsonify({"status": "error", "message": "Each batch item must be a JSON object"}), 400
+        item = {**_BATCH_ITEM_DEFAULTS, **item}
+        generator = _GENERATORS.get(str(item["type"]))
+        if generator is None:
+            return jsonify({"status": "error", "message": f"Unknown QR type: {item['type']}"}), 400
+        jobs.append((generator, str(item["slug"]), str(item["target"])))
+    
+    files = [generator(slug, target)[0] for generator, slug, target in jobs]
+    logger.info("QR Batch Generated: %d files", len(files))
+    return jsonify({"status": "success", "files": files})
+
 @app.route('/<path:filename>')
 def serve_qr(filename):
     """Serves the generated B&W images back to the Omega UI Hub frontend."""
     return send_from_directory('.', filename)
 
-if __name__ == "__main__":
+def _warmup():
+    """Renders the launch QR and any QR_WARMUP_SLUGS before serving so the first requests hit a warm cache."""
     # Initial system generation for the Universal Command Protocol launch
     generate_qr_bw("ucp-launch", "https://syncloudconnect.com/ucp")
+    
+    # Comma-separated hot slugs, primed for every generator type with default params
+    slugs = [s.strip() for s in os.environ.get("QR_WARMUP_SLUGS", "").split(",") if s.strip()]
+    for slug in slugs:
+        for generator in _GENERATORS.values():
+            generator(slug, _GENERATE_DEFAULTS["target"])
+    if slugs:
+        logger.info("Warmed %d slugs", len(slugs))
+
+if __name__ == "__main__":
+    _warmup()
     print(f"{ACCENT_MAGENTA}Omega QR Engine{RESET} listening on port 5001...")
-    app.run(port=5001)
\ No newline at end of file
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is None or _env_flag("OMEGA_DEV"):
+        # Werkzeug dev server; set OMEGA_DEV=1 or skip installing waitress to use it
+        app.run(port=5001)
+    else:
+        try:
+            threads = int(os.environ.get("OMEGA_WSGI_THREADS", DEFAULT_WSGI_THREADS))
+        except ValueError:
+            threads = 0
+        if threads < 1:
+            logger.warning("Invalid OMEGA_WSGI_THREADS, using %d", DEFAULT_WSGI_THREADS)
+            threads = DEFAULT_WSGI_THREADS
+        serve(app, host="127.0.0.1", port=5001, threads=threads)